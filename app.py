@@ -1,18 +1,18 @@
 # app.py
 import time
-import sqlite3
 from datetime import datetime, timezone
 from typing import Optional, Tuple, List, Dict
 
+import numpy as np
 import pandas as pd
 import altair as alt
 import streamlit as st
 
 from src.config import Config
 from src.processing.clean import clean_jobs
-from src.processing.skill_extract import extract_skills
-from src.processing.role_bucket import classify_role
-from src.storage.db import init_db, insert_jobs
+from src.processing.skill_extract import SKILL_KEYWORDS, SKILL_BITS, extract_skills, skills_to_mask, skill_mask_matrix
+from src.processing.role_bucket import classify_role_series
+from src.storage.db import init_db, insert_jobs, get_job_description, get_connection, connection_lock
 
 from src.data_sources.adzuna_client import fetch_jobs as fetch_jobs_adzuna
 
@@ -70,143 +70,233 @@ st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 # -----------------------------
 # DB helpers (lightweight, in-app)
 # -----------------------------
-def _conn() -> sqlite3.Connection:
-    return sqlite3.connect(Config.DB_PATH, check_same_thread=False)
-
 def ensure_metrics_table() -> None:
-    con = _conn()
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS runs (
-            run_id TEXT PRIMARY KEY,
-            run_ts TEXT,
-            source TEXT,
-            keyword TEXT,
-            location TEXT,
-            jobs_fetched INTEGER,
-            unique_companies INTEGER,
-            remote_share REAL
-        );
-    """)
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS skills_daily (
-            date TEXT,
-            skill TEXT,
-            count INTEGER,
-            PRIMARY KEY(date, skill)
-        );
-    """)
-    con.close()
+    con = get_connection()
+    with connection_lock():
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                run_ts TEXT,
+                source TEXT,
+                keyword TEXT,
+                location TEXT,
+                jobs_fetched INTEGER,
+                unique_companies INTEGER,
+                remote_share REAL
+            );
+        """)
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS skills_daily (
+                date TEXT,
+                skill TEXT,
+                count INTEGER,
+                PRIMARY KEY(date, skill)
+            );
+        """)
+        # skill-first lookups (load_skill_history) and newest-first run scans (load_runs)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_skills_daily_skill ON skills_daily(skill, date DESC);")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_runs_ts ON runs(run_ts DESC);")
 
 def upsert_skill_counts(date_str: str, skill_counts: pd.DataFrame) -> None:
     # skill_counts columns: skill, count
-    con = _conn()
-    for _, r in skill_counts.iterrows():
-        con.execute(
+    rows = list(zip(
+        [date_str] * len(skill_counts),
+        skill_counts["skill"].astype(str),
+        skill_counts["count"].astype(int).tolist(),
+    ))
+    con = get_connection()
+    with connection_lock(), con:  # single transaction for the whole batch
+        # A day holds the latest refresh's counts, not skills left over from earlier ones.
+        con.execute("DELETE FROM skills_daily WHERE date = ?", (date_str,))
+        con.executemany(
             "INSERT OR REPLACE INTO skills_daily(date, skill, count) VALUES (?, ?, ?)",
-            (date_str, str(r["skill"]), int(r["count"])),
+            rows,
         )
-    con.commit()
-    con.close()
 
 def write_run_metrics(run_id: str, run_ts: str, source: str, keyword: str, location: str,
                       jobs_fetched: int, unique_companies: int, remote_share: float) -> None:
-    con = _conn()
-    con.execute(
-        """INSERT OR REPLACE INTO runs
-           (run_id, run_ts, source, keyword, location, jobs_fetched, unique_companies, remote_share)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-        (run_id, run_ts, source, keyword, location, jobs_fetched, unique_companies, remote_share),
-    )
-    con.commit()
-    con.close()
+    con = get_connection()
+    with connection_lock():
+        with con:
+            con.execute(
+                """INSERT OR REPLACE INTO runs
+                   (run_id, run_ts, source, keyword, location, jobs_fetched, unique_companies, remote_share)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (run_id, run_ts, source, keyword, location, jobs_fetched, unique_companies, remote_share),
+            )
+        # Once per refresh: let SQLite refresh planner stats for the indexes above.
+        con.execute("PRAGMA optimize")
 
 def load_runs(days: int = 14) -> pd.DataFrame:
-    con = _conn()
-    df = pd.read_sql_query(
-        """
-        SELECT run_ts, source, keyword, location, jobs_fetched, unique_companies, remote_share
-        FROM runs
-        ORDER BY run_ts DESC
-        LIMIT ?
-        """,
-        con,
-        params=(days * 6,),  # rough: up to ~6 refreshes/day
-    )
-    con.close()
+    con = get_connection()
+    with connection_lock():
+        df = pd.read_sql_query(
+            """
+            SELECT run_ts, source, keyword, location, jobs_fetched, unique_companies, remote_share
+            FROM runs
+            ORDER BY run_ts DESC
+            LIMIT ?
+            """,
+            con,
+            params=(days * 6,),  # rough: up to ~6 refreshes/day
+        )
     if df.empty:
         return df
     df["run_ts"] = pd.to_datetime(df["run_ts"], errors="coerce")
     return df
 
 def load_skill_history(skill: str, days: int = 14) -> pd.DataFrame:
-    con = _conn()
-    df = pd.read_sql_query(
-        """
-        SELECT date, count
-        FROM skills_daily
-        WHERE skill = ?
-        ORDER BY date DESC
-        LIMIT ?
-        """,
-        con,
-        params=(skill, days),
-    )
-    con.close()
+    con = get_connection()
+    with connection_lock():
+        df = pd.read_sql_query(
+            """
+            SELECT date, count
+            FROM skills_daily
+            WHERE skill = ?
+            ORDER BY date DESC
+            LIMIT ?
+            """,
+            con,
+            params=(skill, days),
+        )
     if df.empty:
         return df
     df["date"] = pd.to_datetime(df["date"], errors="coerce")
     return df.sort_values("date")
 
-def get_yesterday_counts(date_str: str) -> pd.DataFrame:
-    con = _conn()
-    df = pd.read_sql_query(
-        """
-        SELECT skill, count
-        FROM skills_daily
-        WHERE date = date(?, '-1 day')
-        """,
-        con,
-        params=(date_str,),
+def get_skill_deltas(date_str: str, current: pd.DataFrame) -> pd.DataFrame:
+    # Current refresh (current: skill, count) vs yesterday's stored counts in one query.
+    # SQLite < 3.39 lacks FULL OUTER JOIN, hence LEFT JOIN + UNION ALL.
+    cols = ["skill", "count_today", "count_yday", "delta", "pct_delta"]
+    if current.empty:
+        return pd.DataFrame(columns=cols)
+    values = ", ".join(["(?, ?)"] * len(current))
+    params = [v for r in zip(current["skill"].astype(str), current["count"].astype(int).tolist()) for v in r]
+    con = get_connection()
+    with connection_lock():
+        df = pd.read_sql_query(
+            f"""
+            WITH t(skill, count) AS (VALUES {values}),
+            y AS (
+                SELECT skill, count FROM skills_daily
+                WHERE date = date(?, '-1 day')
+            ),
+            j AS (
+                SELECT t.skill AS skill, t.count AS count_today, COALESCE(y.count, 0) AS count_yday
+                FROM t LEFT JOIN y ON y.skill = t.skill
+                UNION ALL
+                SELECT y.skill, 0, y.count
+                FROM y LEFT JOIN t ON t.skill = y.skill
+                WHERE t.skill IS NULL
+            )
+            SELECT skill, count_today, count_yday, count_today - count_yday AS delta
+            FROM j
+            ORDER BY delta DESC
+            """,
+            con,
+            params=(*params, date_str),
+        )
+    yday = df["count_yday"]
+    df["pct_delta"] = np.where(
+        yday > 0,
+        df["delta"] / yday.where(yday > 0) * 100,
+        np.where(df["count_today"] > 0, 100.0, 0.0),
     )
-    con.close()
     return df
 
 
 # -----------------------------
 # Analytics helpers
 # -----------------------------
-def estimate_remote_flag(row: pd.Series) -> bool:
-    loc = (row.get("location") or "").lower()
-    title = (row.get("title") or "").lower()
-    desc = (row.get("description") or "").lower()
-    remote_tokens = ["remote", "work from home", "wfh", "distributed"]
-    return any(t in loc for t in remote_tokens) or any(t in title for t in remote_tokens) or any(t in desc for t in remote_tokens)
+REMOTE_PATTERN = r"remote|work from home|wfh|distributed"
+
+def estimate_remote_flags(df: pd.DataFrame) -> pd.Series:
+    # Vectorized: one regex scan per column instead of a Python loop over rows.
+    flags = pd.Series(False, index=df.index)
+    for col in ["location", "title", "description"]:
+        if col in df:
+            flags |= df[col].fillna("").str.lower().str.contains(REMOTE_PATTERN, regex=True, na=False)
+    return flags
+
+def compact_jobs_df(df: pd.DataFrame) -> pd.DataFrame:
+    # Shrink what we keep in session state: low-cardinality text → category, and drop
+    # descriptions (they stay in the jobs table; the Raw Data preview reads them by id).
+    df = df.drop(columns=["description"], errors="ignore")
+    for col in ["role", "location", "company"]:
+        if col in df:
+            df[col] = df[col].astype("category")
+    if "is_remote" in df:
+        df["is_remote"] = df["is_remote"].astype(bool)
+    return df
+
+def _skill_matrix(df: pd.DataFrame) -> Optional[np.ndarray]:
+    # Bit matrix from skills_mask, or None when some row's list holds skills outside
+    # the keyword vocabulary (e.g. from AI enrichment) that the mask can't represent.
+    if "skills_mask" not in df or "mask_complete" not in df or df.empty or not df["mask_complete"].all():
+        return None
+    return skill_mask_matrix(df["skills_mask"].to_numpy(dtype=np.uint32))
 
 def skill_counts_from_df(df: pd.DataFrame) -> pd.DataFrame:
-    # df["skills"] is list
-    s = df["skills"].explode()
-    counts = s.value_counts().reset_index()
-    counts.columns = ["skill", "count"]
-    return counts
+    bits = _skill_matrix(df)
+    if bits is not None:
+        counts = pd.DataFrame({"skill": SKILL_KEYWORDS, "count": bits.sum(axis=0)})
+        counts = counts[counts["count"] > 0]
+        return counts.sort_values("count", ascending=False, kind="stable").reset_index(drop=True)
+    # df["skills"] is list; counting categorical codes avoids hashing Python strings
+    s = df["skills"].explode().dropna().astype("category")
+    return s.value_counts().rename_axis("skill").reset_index(name="count")
 
 def top_skill_pairs(df: pd.DataFrame, top_n_skills: int = 20, top_pairs: int = 15) -> pd.DataFrame:
-    # For each job, create pairs among its skills; aggregate counts.
-    from itertools import combinations
-    counts = {}
     # restrict to top skills to keep it fast + readable
-    top_sk = set(skill_counts_from_df(df).head(top_n_skills)["skill"].tolist())
-    for skills in df["skills"].tolist():
-        skills = [s for s in (skills or []) if s in top_sk]
-        skills = sorted(set(skills))
-        for a, b in combinations(skills, 2):
-            key = (a, b)
-            counts[key] = counts.get(key, 0) + 1
-    out = pd.DataFrame(
-        [{"skill_a": k[0], "skill_b": k[1], "co_occurrences": v} for k, v in counts.items()]
+    top_sk = sorted(skill_counts_from_df(df).head(top_n_skills)["skill"].tolist())
+    bits = _skill_matrix(df)
+    if bits is not None:
+        # Co-occurrence matrix in one product; upper triangle gives pairs with a < b.
+        sub = bits[:, [SKILL_BITS[s] for s in top_sk]]
+        co = sub.T @ sub
+        a, b = np.triu_indices(len(top_sk), k=1)
+        out = pd.DataFrame({
+            "skill_a": np.array(top_sk, dtype=object)[a],
+            "skill_b": np.array(top_sk, dtype=object)[b],
+            "co_occurrences": co[a, b],
+        })
+        out = out[out["co_occurrences"] > 0]
+        if out.empty:
+            return pd.DataFrame()
+        return out.sort_values("co_occurrences", ascending=False, kind="stable").head(top_pairs)
+
+    # Explode to (job, skill) rows, self-join on job and count each (a, b) pair with a < b.
+    top_sk = set(top_sk)
+    s = df["skills"].apply(lambda xs: sorted({x for x in (xs or []) if x in top_sk}))
+    flat = s.explode().dropna().rename("skill").rename_axis("job").reset_index()
+    if flat.empty:
+        return pd.DataFrame()
+    j = flat.merge(flat, on="job")
+    j = j[j["skill_x"] < j["skill_y"]]
+    if j.empty:
+        return pd.DataFrame()
+    return (
+        j.groupby(["skill_x", "skill_y"]).size()
+        .reset_index(name="co_occurrences")
+        .rename(columns={"skill_x": "skill_a", "skill_y": "skill_b"})
+        .sort_values("co_occurrences", ascending=False)
+        .head(top_pairs)
     )
-    if out.empty:
-        return out
-    return out.sort_values("co_occurrences", ascending=False).head(top_pairs)
+
+def skills_snapshot(df: pd.DataFrame) -> Tuple[Tuple[str, ...], ...]:
+    # Hashable view of the skills column, used as part of the cache key below.
+    return tuple(tuple(xs or []) for xs in df["skills"])
+
+# _df is excluded from Streamlit's hashing; run_id + skills snapshot form the key.
+# Only the current refresh is read, so a few entries bound memory under auto-refresh.
+@st.cache_data(show_spinner=False, max_entries=4)
+def cached_skill_counts(run_id: Optional[str], skills: Tuple[Tuple[str, ...], ...], _df: pd.DataFrame) -> pd.DataFrame:
+    return skill_counts_from_df(_df)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def cached_skill_pairs(run_id: Optional[str], skills: Tuple[Tuple[str, ...], ...], _df: pd.DataFrame,
+                       top_n_skills: int = 20, top_pairs: int = 15) -> pd.DataFrame:
+    return top_skill_pairs(_df, top_n_skills=top_n_skills, top_pairs=top_pairs)
 
 def chart_bar(df: pd.DataFrame, x: str, y: str, title: str) -> alt.Chart:
     return (
@@ -294,34 +384,6 @@ with st.sidebar:
     st.caption("Deploy tip: set secrets in Streamlit Cloud to protect API keys.")
 
 
-# -----------------------------
-# Auto refresh (simple)
-# -----------------------------
-if auto_refresh:
-    # A simple "soft" auto-refresh loop: rerun after interval
-    # Note: Streamlit doesn't have a built-in rerun timer without extras; this pattern is reliable.
-    time.sleep(0.01)
-    st.session_state["_next_refresh_ts"] = time.time() + refresh_every
-
-
-# -----------------------------
-# Actions row
-# -----------------------------
-left, right = st.columns([1, 2])
-with left:
-    refresh_clicked = st.button("Refresh live data", type="primary", use_container_width=True)
-with right:
-    if st.session_state.last_refresh:
-        st.info(f"Last refreshed: {st.session_state.last_refresh} (UTC)", icon="⏱️")
-    else:
-        st.info("Not refreshed yet — click **Refresh live data**.", icon="⏱️")
-
-# Auto refresh trigger
-if auto_refresh and st.session_state.get("_next_refresh_ts") and time.time() >= st.session_state["_next_refresh_ts"]:
-    refresh_clicked = True
-    st.session_state["_next_refresh_ts"] = time.time() + refresh_every
-
-
 # -----------------------------
 # Refresh pipeline
 # -----------------------------
@@ -337,26 +399,38 @@ def run_pipeline() -> Tuple[pd.DataFrame, str]:
 
         # Core extraction
         df["skills"] = df["description"].apply(lambda x: extract_skills(x or ""))
-        df["role"] = df["title"].apply(lambda x: classify_role(x or ""))
+        df["role"] = classify_role_series(df["title"])
 
         # Remote estimate
-        df["is_remote"] = df.apply(estimate_remote_flag, axis=1)
+        df["is_remote"] = estimate_remote_flags(df)
+
+        # Keyword skills are all in the mask vocabulary; AI merges below may add others.
+        mask_complete = np.ones(len(df), dtype=bool)
 
         # Optional AI: augment skills (cheap mode)
-        if enable_ai and HAS_AI and getattr(Config, "GEMINI_API_KEY", None):
+        if enable_ai and HAS_AI and (getattr(Config, "GEMINI_API_KEY", None) or getattr(Config, "AI_REPLAY", False)):
             # Only enrich a limited subset for cost control; merge with baseline skills.
             # You can raise this cap later.
             cap = min(25, len(df))
-            idxs = df.head(cap).index.tolist()
-            for i in idxs:
-                try:
-                    ai_sk = enrich_skills_with_ai(df.at[i, "description"] or "")
+            try:
+                # One batched prompt for the whole subset instead of a round-trip per job.
+                ai_lists = enrich_skills_with_ai(df["description"].iloc[:cap].fillna("").tolist())
+                # Merge in plain Python, then write the column back once.
+                new_skills = df["skills"].tolist()
+                for j, ai_sk in enumerate(ai_lists):
                     if ai_sk:
-                        merged = sorted(set((df.at[i, "skills"] or []) + ai_sk))
-                        df.at[i, "skills"] = merged
-                except Exception:
-                    # Keep baseline if AI fails
-                    pass
+                        new_skills[j] = sorted(set((new_skills[j] or []) + ai_sk))
+                        mask_complete[j] = all(x in SKILL_BITS for x in ai_sk)
+                df["skills"] = new_skills
+            except Exception:
+                # Keep baseline if AI fails
+                pass
+
+        # Bit-packed view of the vocabulary skills (the list column stays for display)
+        df["skills_mask"] = np.fromiter(
+            (skills_to_mask(xs) for xs in df["skills"]), dtype=np.uint32, count=len(df)
+        )
+        df["mask_complete"] = mask_complete
 
         # Snapshot metrics
         utc_now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
@@ -382,18 +456,48 @@ def run_pipeline() -> Tuple[pd.DataFrame, str]:
         return df, utc_now
 
 
-if refresh_clicked:
-    try:
-        df, refreshed_at = run_pipeline()
-        st.session_state.df = df
-        st.session_state.last_refresh = refreshed_at
-        st.session_state.run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+# -----------------------------
+# Actions row (auto-refresh runs this fragment on a timer)
+# -----------------------------
+@st.fragment(run_every=refresh_every if auto_refresh else None)
+def actions_row() -> None:
+    left, right = st.columns([1, 2])
+    with left:
+        refresh_clicked = st.button("Refresh live data", type="primary", use_container_width=True)
+    with right:
+        if st.session_state.last_refresh:
+            st.info(f"Last refreshed: {st.session_state.last_refresh} (UTC)", icon="⏱️")
+        else:
+            st.info("Not refreshed yet — click **Refresh live data**.", icon="⏱️")
+
+    if st.session_state.pop("_refresh_ok", False):
         st.success("Updated with live data.", icon="✅")
-    except Exception as e:
-        st.error(f"Refresh failed: {e}")
+
+    # The fragment also runs on full-app reruns, so only refresh once the interval has elapsed.
+    if not auto_refresh or refresh_clicked:
+        st.session_state["_last_refresh_ts"] = time.time()
+    elif time.time() - st.session_state.get("_last_refresh_ts", 0) >= refresh_every:
+        st.session_state["_last_refresh_ts"] = time.time()
+        refresh_clicked = True
+
+    if refresh_clicked:
+        try:
+            df, refreshed_at = run_pipeline()
+            st.session_state.df = compact_jobs_df(df)
+            st.session_state.last_refresh = refreshed_at
+            st.session_state.run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+            st.session_state["_refresh_ok"] = True
+        except Exception as e:
+            st.error(f"Refresh failed: {e}")
+            return
+        # New data: redraw the rest of the dashboard
+        st.rerun()
+
+actions_row()
 
 
 df: pd.DataFrame = st.session_state.df
+skills_key = skills_snapshot(df) if not df.empty else ()
 
 
 # -----------------------------
@@ -414,31 +518,26 @@ with tabs[0]:
 
         st.markdown("<hr class='sp-hr'/>", unsafe_allow_html=True)
 
+        sc_all = cached_skill_counts(st.session_state.run_id, skills_key, df)
+
         left, right = st.columns([1.2, 1])
         with left:
             role_counts = df["role"].value_counts().reset_index()
             role_counts.columns = ["role", "count"]
             st.altair_chart(chart_bar(role_counts, "role", "count", "Role mix (current refresh)"), use_container_width=True)
         with right:
-            top_sk = skill_counts_from_df(df).head(10)
+            top_sk = sc_all.head(10)
             st.altair_chart(chart_bar(top_sk, "skill", "count", "Top skills (current refresh)"), use_container_width=True)
 
         st.markdown("<hr class='sp-hr'/>", unsafe_allow_html=True)
 
         st.subheader("What changed (quick read)")
         today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        curr = skill_counts_from_df(df)
-        prev = get_yesterday_counts(today)
+        merged = get_skill_deltas(today, sc_all)
 
-        if prev.empty or curr.empty:
+        if not (merged["count_yday"] > 0).any() or not (merged["count_today"] > 0).any():
             st.markdown("<div class='sp-card'><div class='sp-muted'>Not enough history yet. Refresh today and again tomorrow to unlock growth insights.</div></div>", unsafe_allow_html=True)
         else:
-            merged = curr.merge(prev, on="skill", how="outer", suffixes=("_today", "_yday")).fillna(0)
-            merged["delta"] = merged["count_today"] - merged["count_yday"]
-            merged["pct_delta"] = merged.apply(
-                lambda r: (r["delta"] / r["count_yday"] * 100) if r["count_yday"] > 0 else (100.0 if r["count_today"] > 0 else 0.0),
-                axis=1,
-            )
             movers_up = merged.sort_values(["delta", "count_today"], ascending=False).head(5)
             movers_dn = merged.sort_values(["delta", "count_today"], ascending=True).head(5)
 
@@ -460,12 +559,12 @@ with tabs[1]:
         st.markdown("<div class='sp-card'>Refresh live data to view skill analytics.</div>", unsafe_allow_html=True)
     else:
         st.subheader("Skill intelligence")
-        sc = skill_counts_from_df(df)
+        sc = cached_skill_counts(st.session_state.run_id, skills_key, df)
         left, right = st.columns([1, 1])
         with left:
             st.altair_chart(chart_bar(sc.head(20), "skill", "count", "Top 20 skills"), use_container_width=True)
         with right:
-            pairs = top_skill_pairs(df, top_n_skills=20, top_pairs=15)
+            pairs = cached_skill_pairs(st.session_state.run_id, skills_key, df, top_n_skills=20, top_pairs=15)
             st.markdown("<div class='sp-card'><b>Skill co-occurrence (top pairs)</b><div class='sp-muted'>Which skills frequently appear together in postings.</div></div>", unsafe_allow_html=True)
             if pairs.empty:
                 st.info("Not enough multi-skill postings to compute co-occurrence pairs yet.")
@@ -544,7 +643,7 @@ with tabs[4]:
 
         with st.expander("Preview job description"):
             idx = st.number_input("Row index", min_value=0, max_value=max(0, len(df) - 1), value=0, step=1)
-            st.write(df.iloc[int(idx)].get("description", ""))
+            st.write(get_job_description(str(df.iloc[int(idx)]["id"])) or "")
 
 # ---------- About ----------
 with tabs[5]:
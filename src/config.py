@@ -10,6 +10,14 @@ class Config:
 
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
+    # Serve AI enrichment from the local cache only (no Gemini calls on misses)
+    AI_REPLAY = os.getenv("SKILLPULSE_AI_REPLAY") == "1"
 
     DB_PATH = "skillpulse.db"
     MAX_RESULTS = 100
+
+    # Client-side rate limits (per minute)
+    ADZUNA_RPM = 25
+    JSEARCH_RPM = 10
+    GEMINI_RPM = 15
+    GEMINI_TPM = 1_000_000
@@ -1,22 +1,56 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from src.config import Config
+from src.util.rate_limit import TokenBucket
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
 
 BASE_URL = "https://api.adzuna.com/v1/api/jobs"
+PAGE_SIZE = 50
+MAX_WORKERS = 4
 
-def fetch_jobs(keyword="data", location="united states", results=50):
-    url = f"{BASE_URL}/{Config.ADZUNA_COUNTRY}/search/1"
+_retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=_retry)
+_session = requests.Session()
+_session.mount("https://", _adapter)
+_limiter = TokenBucket(Config.ADZUNA_RPM)
+
+def _fetch_page(page, keyword, location, per_page):
+    url = f"{BASE_URL}/{Config.ADZUNA_COUNTRY}/search/{page}"
     params = {
         "app_id": Config.ADZUNA_APP_ID,
         "app_key": Config.ADZUNA_APP_KEY,
         "what": keyword,
         "where": location,
-        "results_per_page": results,
+        "results_per_page": per_page,
         "content-type": "application/json"
     }
 
-    response = requests.get(url, params=params)
+    _limiter.acquire()
+    response = _session.get(url, params=params, timeout=30)
     response.raise_for_status()
-    data = response.json()["results"]
+    return _loads(response.content)["results"]
+
+def fetch_jobs(keyword="data", location="united states", results=50):
+    # Adzuna caps a page at PAGE_SIZE results; fetch the pages concurrently.
+    per_page = min(results, PAGE_SIZE)
+    n_pages = max(1, math.ceil(results / PAGE_SIZE))
+    with ThreadPoolExecutor(max_workers=min(n_pages, MAX_WORKERS)) as executor:
+        pages = executor.map(
+            lambda p: _fetch_page(p, keyword, location, per_page),
+            range(1, n_pages + 1),
+        )
+        data = list(chain.from_iterable(pages))[:results]
 
     jobs = []
     for job in data:
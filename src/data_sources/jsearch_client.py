@@ -1,8 +1,24 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from src.config import Config
+from src.util.rate_limit import TokenBucket
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
 
 BASE_URL = "https://jsearch.p.rapidapi.com/search"
 
+_retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=_retry)
+_session = requests.Session()
+_session.mount("https://", _adapter)
+_limiter = TokenBucket(Config.JSEARCH_RPM)
+
 def fetch_jobs_jsearch(keyword="data scientist", location="United States", page=1):
     """
     Fetch real-time job postings using JSearch API (RapidAPI).
@@ -24,9 +40,10 @@ def fetch_jobs_jsearch(keyword="data scientist", location="United States", page=
         "date_posted": "all"
     }
 
-    response = requests.get(BASE_URL, headers=headers, params=querystring, timeout=30)
+    _limiter.acquire()
+    response = _session.get(BASE_URL, headers=headers, params=querystring, timeout=30)
     response.raise_for_status()
-    results = response.json().get("data", [])
+    results = _loads(response.content).get("data", [])
 
     jobs = []
     for job in results:
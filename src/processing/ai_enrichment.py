@@ -1,21 +1,114 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 import google.generativeai as genai
 from src.config import Config
+from src.storage.db import get_ai_cache, put_ai_cache
+from src.util.rate_limit import TokenBucket
 
-def enrich_skills_with_ai(description):
-    if not Config.GEMINI_API_KEY:
-        return []
+MODEL_NAME = "gemini-1.5-flash"
+TEMPERATURE = 0
 
+_limiter = TokenBucket(Config.GEMINI_RPM, Config.GEMINI_TPM)
+
+def _cache_key(description):
+    return hashlib.sha256(
+        f"{MODEL_NAME}|{TEMPERATURE}|{(description or '')[:2000]}".encode()
+    ).hexdigest()
+
+# In-process LRU in front of the ai_cache table (shared by all session threads)
+_MEMO_SIZE = 1024
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+def _memo_get(key):
+    with _memo_lock:
+        skills = _memo.get(key)
+        if skills is not None:
+            _memo.move_to_end(key)
+        return skills
+
+def _memo_put(key, skills):
+    with _memo_lock:
+        _memo[key] = tuple(skills)
+        _memo.move_to_end(key)
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+
+def _parse_skill_lists(text, n):
+    # Returns None unless the reply is exactly n arrays: with a short or long reply
+    # there is no telling which description each array belongs to.
+    # The model sometimes wraps JSON in a ```json fence; strip it before parsing.
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.lower().startswith("json"):
+            text = text[4:]
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, list) or len(data) != n:
+        return None
+    if not all(isinstance(skills, list) for skills in data):
+        return None
+
+    return [[str(s).strip().lower() for s in skills if str(s).strip()] for skills in data]
+
+def _call_gemini(descriptions):
     genai.configure(api_key=Config.GEMINI_API_KEY)
-    model = genai.GenerativeModel("gemini-1.5-flash")
+    model = genai.GenerativeModel(MODEL_NAME)
 
+    numbered = "\n".join(
+        f"{i}. {(d or '')[:2000]}" for i, d in enumerate(descriptions, start=1)
+    )
     prompt = f"""
-    Extract the top 5 standardized technical skills from this job description.
-    Return as a comma-separated list.
+    Extract the top 5 standardized technical skills for each job description below.
+    Return only a JSON array of arrays of strings, one inner array per description, in the same order.
 
-    Description:
-    {description[:2000]}
+    Descriptions:
+    {numbered}
     """
 
-    response = model.generate_content(prompt)
-    skills = response.text.strip().split(",")
-    return [s.strip().lower() for s in skills]
\ No newline at end of file
+    _limiter.acquire(estimated_tokens=len(prompt) // 4)  # ~4 chars per token
+    response = model.generate_content(
+        prompt, generation_config={"temperature": TEMPERATURE}
+    )
+    return _parse_skill_lists(response.text, len(descriptions))
+
+def enrich_skills_with_ai(descriptions):
+    """
+    Extract skills for several job descriptions with a single Gemini call.
+    Results are cached by SHA256 of (model, params, description), so repeat
+    postings are served from SQLite without an API call.
+    Returns one list of skills per description, in the same order; empty lists
+    for misses when the model's reply can't be matched to the batch.
+    """
+    keys = [_cache_key(d) for d in descriptions]
+    out = [None] * len(descriptions)
+    for i, key in enumerate(keys):
+        skills = _memo_get(key)
+        if skills is not None:
+            out[i] = list(skills)
+
+    stored = get_ai_cache(keys[i] for i, skills in enumerate(out) if skills is None)
+    for i, key in enumerate(keys):
+        if out[i] is None and key in stored:
+            out[i] = json.loads(stored[key])
+            _memo_put(key, out[i])
+
+    misses = [i for i, skills in enumerate(out) if skills is None]
+    if misses and Config.GEMINI_API_KEY and not Config.AI_REPLAY:
+        fresh = _call_gemini([descriptions[i] for i in misses])
+        # None means the reply didn't line up with the batch: keep keyword skills only.
+        if fresh is not None:
+            put_ai_cache(
+                (keys[i], json.dumps(skills)) for i, skills in zip(misses, fresh) if skills
+            )
+            for i, skills in zip(misses, fresh):
+                out[i] = skills
+                if skills:
+                    _memo_put(keys[i], skills)
+
+    return [skills or [] for skills in out]
@@ -1,11 +1,25 @@
+import re
+
+# Branches are tried in order at the start of the title, so the first label
+# listed wins when a title matches several (e.g. "Product Data Scientist").
+_ROLE_RE = re.compile(
+    r"^(?:(?=.*?(?P<pm>product))"
+    r"|(?=.*?(?P<ds>data scientist))"
+    r"|(?=.*?(?P<ml>machine learning|ml engineer))"
+    r"|(?=.*?(?P<de>data engineer)))",
+    re.IGNORECASE | re.DOTALL,
+)
+_LABELS = {
+    "pm": "Product Manager",
+    "ds": "Data Scientist",
+    "ml": "ML Engineer",
+    "de": "Data Engineer",
+}
+
 def classify_role(title):
-    t = title.lower()
-    if "product" in t:
-        return "Product Manager"
-    if "data scientist" in t:
-        return "Data Scientist"
-    if "machine learning" in t or "ml engineer" in t:
-        return "ML Engineer"
-    if "data engineer" in t:
-        return "Data Engineer"
-    return "Other"
\ No newline at end of file
+    m = _ROLE_RE.match(title)
+    return _LABELS[m.lastgroup] if m else "Other"
+
+def classify_role_series(titles):
+    hits = titles.fillna("").astype(str).str.extract(_ROLE_RE).notna()
+    return hits.idxmax(axis=1).map(_LABELS).where(hits.any(axis=1), "Other")
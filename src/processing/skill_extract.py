@@ -1,15 +1,69 @@
 import re
 
+import numpy as np
+
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
+
 SKILL_KEYWORDS = [
     "python", "sql", "aws", "gcp", "azure", "machine learning",
     "deep learning", "nlp", "llm", "data science", "tableau",
     "power bi", "spark", "airflow", "product analytics"
 ]
 
-def extract_skills(text):
+# One alternation for the whole vocabulary (longest first so multi-word
+# skills win over any shorter prefix), matched case-insensitively.
+_SKILL_RE = re.compile(
+    r"\b(" + "|".join(map(re.escape, sorted(SKILL_KEYWORDS, key=len, reverse=True))) + r")\b",
+    re.IGNORECASE,
+)
+_CANONICAL = {s.lower(): s for s in SKILL_KEYWORDS}
+
+# Bit index per keyword: a job's vocabulary skills pack into one uint32 mask.
+SKILL_BITS = {s: i for i, s in enumerate(SKILL_KEYWORDS)}
+assert len(SKILL_BITS) <= 32, "skills_mask is a uint32"
+
+# Aho-Corasick automaton: one O(len(text)) scan regardless of vocabulary size.
+if HAS_AHOCORASICK:
+    _AUTOMATON = ahocorasick.Automaton()
+    for _skill in SKILL_KEYWORDS:
+        _AUTOMATON.add_word(_skill.lower(), _skill)
+    _AUTOMATON.make_automaton()
+
+def _is_word_char(c):
+    return c.isalnum() or c == "_"
+
+def _extract_ahocorasick(text):
     text = text.lower()
+    n = len(text)
     found = set()
-    for skill in SKILL_KEYWORDS:
-        if re.search(rf"\b{re.escape(skill)}\b", text):
-            found.add(skill)
+    for end, skill in _AUTOMATON.iter(text):
+        start = end - len(skill) + 1
+        # Same word-boundary rule as the regex's \b
+        if start > 0 and _is_word_char(text[start - 1]):
+            continue
+        if end + 1 < n and _is_word_char(text[end + 1]):
+            continue
+        found.add(skill)
     return list(found)
+
+def extract_skills(text):
+    if HAS_AHOCORASICK:
+        return _extract_ahocorasick(text)
+    return list({_CANONICAL[m.lower()] for m in _SKILL_RE.findall(text)})
+
+def skills_to_mask(skills):
+    mask = 0
+    for s in skills or []:
+        bit = SKILL_BITS.get(s)
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+def skill_mask_matrix(masks):
+    # (n_jobs, n_skills) 0/1 matrix; column i is SKILL_KEYWORDS[i]
+    masks = np.asarray(masks, dtype=np.uint32)
+    return ((masks[:, None] >> np.arange(len(SKILL_KEYWORDS), dtype=np.uint32)) & 1).astype(np.int32)
@@ -1,26 +1,93 @@
 import sqlite3
+import threading
 from datetime import datetime
 from src.config import Config
 
+_conn = None
+# Re-entrant so callers holding it can still call get_connection()
+_conn_lock = threading.RLock()
+
 def get_connection():
-    return sqlite3.connect(Config.DB_PATH)
+    # Shared, lazily-opened connection; callers must not close it.
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            _conn = sqlite3.connect(Config.DB_PATH, check_same_thread=False)
+            _conn.execute("PRAGMA journal_mode=WAL")
+            _conn.execute("PRAGMA synchronous=NORMAL")
+            _conn.execute("PRAGMA temp_store=MEMORY")
+        return _conn
+
+def connection_lock():
+    # Hold this around any use of get_connection(): the connection is shared across threads.
+    return _conn_lock
 
 def init_db():
     conn = get_connection()
     with open("src/storage/schema.sql") as f:
-        conn.executescript(f.read())
-    conn.close()
+        script = f.read()
+    with _conn_lock:
+        conn.executescript(script)
+        _migrate(conn)
+
+def _migrate(conn):
+    # One-off data migrations, tracked in PRAGMA user_version so reruns skip them.
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        # Databases created before skills_daily had its primary key may hold several
+        # rows per (date, skill): keep the latest and enforce uniqueness from here on.
+        with conn:
+            conn.execute("""
+                DELETE FROM skills_daily
+                WHERE rowid NOT IN (SELECT MAX(rowid) FROM skills_daily GROUP BY date, skill)
+            """)
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_skills_daily_date_skill ON skills_daily(date, skill)"
+            )
+            conn.execute("PRAGMA user_version = 1")
 
 def insert_jobs(jobs):
     conn = get_connection()
     now = datetime.utcnow().isoformat()
-    for job in jobs:
-        conn.execute("""
-            INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
+    rows = [
+        (
             job["id"], job["title"], job["company"],
             job["location"], job["description"],
             job["created"], now
-        ))
-    conn.commit()
-    conn.close()
+        )
+        for job in jobs
+    ]
+    with _conn_lock, conn:  # one transaction instead of one per row
+        conn.executemany("""
+            INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+def get_ai_cache(keys):
+    # Batch lookup: returns {key: skills_json} for the keys present in the cache.
+    keys = list(keys)
+    if not keys:
+        return {}
+    conn = get_connection()
+    with _conn_lock:
+        rows = conn.execute(
+            f"SELECT key, skills_json FROM ai_cache WHERE key IN ({', '.join('?' * len(keys))})",
+            keys,
+        ).fetchall()
+    return dict(rows)
+
+def put_ai_cache(items):
+    # items: iterable of (key, skills_json)
+    conn = get_connection()
+    with _conn_lock, conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO ai_cache(key, skills_json) VALUES (?, ?)",
+            list(items),
+        )
+
+def get_job_description(job_id):
+    conn = get_connection()
+    with _conn_lock:
+        row = conn.execute(
+            "SELECT description FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    return row[0] if row else None
@@ -11,5 +11,11 @@ CREATE TABLE IF NOT EXISTS jobs (
 CREATE TABLE IF NOT EXISTS skills_daily (
     date TEXT,
     skill TEXT,
-    count INTEGER
+    count INTEGER,
+    PRIMARY KEY(date, skill)
+);
+
+CREATE TABLE IF NOT EXISTS ai_cache (
+    key TEXT PRIMARY KEY,
+    skills_json TEXT
 );
@@ -0,0 +1,46 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    Client-side limiter for API calls: a request bucket and an optional
+    token bucket, both refilled continuously at their per-minute rate.
+    acquire() blocks until the call fits under both limits.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute) if tokens_per_minute else None
+        self.request_tokens = self.request_capacity
+        self.token_tokens = self.token_capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self.request_tokens = min(
+            self.request_capacity, self.request_tokens + elapsed * self.request_capacity / 60
+        )
+        if self.token_capacity is not None:
+            self.token_tokens = min(
+                self.token_capacity, self.token_tokens + elapsed * self.token_capacity / 60
+            )
+
+    def acquire(self, estimated_tokens=0):
+        if self.token_capacity is not None:
+            # A single call larger than the bucket could never fit; let it through at full bucket.
+            estimated_tokens = min(estimated_tokens, self.token_capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                wait = max(0.0, (1 - self.request_tokens) * 60 / self.request_capacity)
+                if self.token_capacity is not None:
+                    wait = max(wait, (estimated_tokens - self.token_tokens) * 60 / self.token_capacity)
+                if wait <= 0:
+                    self.request_tokens -= 1
+                    if self.token_capacity is not None:
+                        self.token_tokens -= estimated_tokens
+                    return
+            time.sleep(wait)